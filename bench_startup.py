@@ -0,0 +1,83 @@
+"""Startup time benchmark for server.py.
+
+Builds synthetic databases of several sizes and, for each one, measures in a
+fresh interpreter:
+  - import: time until `server.app` exists (the server can accept traffic)
+  - ready:  time until the database has loaded (/readyz returns 200)
+
+Usage: python bench_startup.py [users ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_SIZES = [0, 1000, 10000, 50000]
+RUNS = 3
+
+MEASURE = """
+import time
+start = time.perf_counter()
+import server
+imported = time.perf_counter() - start
+server.db_ready.wait()
+ready = time.perf_counter() - start
+print(imported, ready)
+"""
+
+def build_database(users):
+    data = {
+        'users': {},
+        'profiles': {},
+        'scorecards': {},
+        'discussions': [],
+        'calendar': {},
+        'messages': {}
+    }
+    for i in range(users):
+        username = f'user{i}'
+        data['users'][username] = {
+            'username': username,
+            'password': '0' * 64,
+            'email': f'{username}@example.com',
+            'createdAt': '2026-01-01T00:00:00',
+            'subscription': {'plan': 'free', 'status': 'active',
+                             'stripeCustomerId': None, 'stripeSubscriptionId': None}
+        }
+        data['scorecards'][username] = {
+            'ratings': {'Relationships': 3, 'Work/Life Balance': 4},
+            'history': [{'date': f'1/{d + 1}/2026', 'average': 3.5,
+                         'ratings': {'Relationships': 3, 'Work/Life Balance': 4}}
+                        for d in range(10)]
+        }
+        data['discussions'].append({'id': str(i), 'author': username,
+                                    'content': f'Post number {i} about goals', 'likes': 0})
+    return data
+
+def measure(db_file):
+    env = dict(os.environ, DB_FILE=db_file, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run(
+        [sys.executable, '-c', MEASURE], env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout.strip().splitlines()[-1]
+    imported, ready = output.split()
+    return float(imported), float(ready)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'users':>8} {'db size':>10} {'import (ms)':>12} {'ready (ms)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in sizes:
+            db_file = os.path.join(tmp, f'database-{users}.json')
+            with open(db_file, 'w') as f:
+                json.dump(build_database(users), f, indent=2)
+
+            results = [measure(db_file) for _ in range(RUNS)]
+            imported = min(r[0] for r in results) * 1000
+            ready = min(r[1] for r in results) * 1000
+            size = os.path.getsize(db_file) / 1024 / 1024
+            print(f"{users:>8} {size:>8.1f}MB {imported:>12.1f} {ready:>12.1f}")
+
+if __name__ == '__main__':
+    main()
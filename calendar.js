@@ -1,40 +1,101 @@
 (function(){
-  const CALENDAR_KEY = 'scorecard:calendar';
+  const LEGACY_CALENDAR_KEY = 'scorecard:calendar';
   let currentYear = new Date().getFullYear();
   let currentMonth = new Date().getMonth();
+  let monthEvents = [];
+  let eventDates = new Set();
+
+  async function calendarRequest(endpoint, method = 'GET', body = null){
+    const authToken = localStorage.getItem('authToken');
+    const options = {
+      method,
+      headers: { 'Content-Type': 'application/json' },
+      credentials: 'same-origin'
+    };
+    if (authToken) options.headers['Authorization'] = authToken;
+    if (body) options.body = JSON.stringify(body);
+
+    const response = await fetch(endpoint, options);
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.error || 'Request failed');
+    return data;
+  }
+
+  function toDateStr(year, month, day){
+    return `${year}-${String(month+1).padStart(2,'0')}-${String(day).padStart(2,'0')}`;
+  }
 
-  function getEvents(){
+  // Fetch only the events (and recurring occurrences) inside the given month
+  async function fetchMonthEvents(year, month){
+    const from = toDateStr(year, month, 1);
+    const to = toDateStr(year, month, new Date(year, month + 1, 0).getDate());
     try {
-      return JSON.parse(localStorage.getItem(CALENDAR_KEY) || '[]');
-    } catch {
-      return [];
+      const data = await calendarRequest(`/api/calendar?from=${from}&to=${to}`);
+      monthEvents = data.events || [];
+    } catch (error) {
+      console.error('Error loading calendar events:', error);
+      monthEvents = [];
     }
+    eventDates = new Set(monthEvents.map(e => e.date));
   }
 
-  function saveEvents(events){
-    localStorage.setItem(CALENDAR_KEY, JSON.stringify(events));
+  // Upload events saved in localStorage by older versions of this page, once
+  async function migrateLegacyEvents(){
+    let legacyEvents;
+    try {
+      legacyEvents = JSON.parse(localStorage.getItem(LEGACY_CALENDAR_KEY) || '[]');
+    } catch {
+      legacyEvents = [];
+    }
+    if(!Array.isArray(legacyEvents) || legacyEvents.length === 0){
+      localStorage.removeItem(LEGACY_CALENDAR_KEY);
+      return;
+    }
+
+    const remaining = [];
+    for(const event of legacyEvents){
+      try {
+        await calendarRequest('/api/calendar/events', 'POST', {
+          title: event.title,
+          date: event.date,
+          description: event.description
+        });
+      } catch (error) {
+        if(!/required|must be/i.test(error.message)) remaining.push(event);  // retry later unless invalid
+      }
+    }
+    if(remaining.length){
+      localStorage.setItem(LEGACY_CALENDAR_KEY, JSON.stringify(remaining));
+    } else {
+      localStorage.removeItem(LEGACY_CALENDAR_KEY);
+    }
   }
 
-  function addEvent(title, date, description){
-    const events = getEvents();
-    events.push({
-      id: Date.now().toString(),
-      title: title,
-      date: date,
-      description: description
-    });
-    saveEvents(events);
-    loadEvents();
+  async function refreshMonth(){
+    await fetchMonthEvents(currentYear, currentMonth);
     renderCalendar(currentYear, currentMonth);
+    loadEvents();
+  }
+
+  async function addEvent(title, date, description, recurrence){
+    try {
+      await calendarRequest('/api/calendar/events', 'POST', { title, date, description, recurrence });
+    } catch (error) {
+      alert(error.message);
+      return;
+    }
+    await refreshMonth();
   }
 
-  function deleteEvent(eventId){
+  async function deleteEvent(eventId){
     if(!confirm('Delete this event?')) return;
-    let events = getEvents();
-    events = events.filter(e => e.id !== eventId);
-    saveEvents(events);
-    loadEvents();
-    renderCalendar(currentYear, currentMonth);
+    try {
+      await calendarRequest(`/api/calendar/events/${encodeURIComponent(eventId)}`, 'DELETE');
+    } catch (error) {
+      alert(error.message);
+      return;
+    }
+    await refreshMonth();
   }
 
   function renderCalendar(year, month){
@@ -57,8 +118,6 @@
       </div>
       <div class="calendar-days">`;
 
-    const events = getEvents();
-    
     // Previous month days
     for(let i = firstDay - 1; i >= 0; i--){
       html += `<div class="calendar-day other-month">${daysInPrevMonth - i}</div>`;
@@ -66,8 +125,8 @@
 
     // Current month days
     for(let day = 1; day <= daysInMonth; day++){
-      const dateStr = `${year}-${String(month+1).padStart(2,'0')}-${String(day).padStart(2,'0')}`;
-      const hasEvent = events.some(e => e.date === dateStr);
+      const dateStr = toDateStr(year, month, day);
+      const hasEvent = eventDates.has(dateStr);
       const isToday = dateStr === todayStr;
       const classes = ['calendar-day'];
       if (isToday) classes.push('today');
@@ -103,17 +162,15 @@
       currentMonth = 11;
       currentYear--;
     }
-    renderCalendar(currentYear, currentMonth);
+    refreshMonth();
   }
 
   function loadEvents(selectedDate = null){
     const container = document.getElementById('eventsContainer');
     if(!container) return;
 
-    const events = getEvents().sort((a, b) => new Date(a.date) - new Date(b.date));
-    
-    const today = new Date().toISOString().split('T')[0];
-    const filteredEvents = selectedDate ? events.filter(e => e.date === selectedDate) : events;
+    // monthEvents arrive sorted by date from the server
+    const filteredEvents = selectedDate ? monthEvents.filter(e => e.date === selectedDate) : monthEvents;
 
     let html = '';
     if(filteredEvents.length === 0){
@@ -126,7 +183,7 @@
             <div class="event-title">${event.title}</div>
             <div class="event-date">${eventDate}</div>
             ${event.description ? `<div class="event-desc" style="color: #666; margin-top: 8px;">${event.description}</div>` : ''}
-            ${window.isAdmin ? `<div class="event-actions"><button class="event-delete" onclick="window.deleteCalendarEvent('${event.id}')">Delete Event</button></div>` : ''}
+            ${!event.shared ? `<div class="event-actions"><button class="event-delete" onclick="window.deleteCalendarEvent('${event.id}')">Delete Event</button></div>` : ''}
           </div>
         `;
       });
@@ -136,8 +193,9 @@
 
   if(window.location.pathname.includes('calendar.html')){
     // Wait for auth to be ready before initializing calendar
-    const initCalendar = () => {
-      renderCalendar(currentYear, currentMonth);
+    const initCalendar = async () => {
+      await migrateLegacyEvents();
+      refreshMonth();
 
       const adminForm = document.getElementById('adminEventForm');
       const eventForm = document.getElementById('eventForm');
@@ -150,13 +208,13 @@
           const title = document.getElementById('eventTitle').value;
           const date = document.getElementById('eventDate').value;
           const description = document.getElementById('eventDescription').value;
+          const repeatSelect = document.getElementById('eventRepeat');
+          const recurrence = repeatSelect && repeatSelect.value ? { freq: repeatSelect.value } : null;
           
-          addEvent(title, date, description);
+          addEvent(title, date, description, recurrence);
           eventForm.reset();
         });
       }
-
-      loadEvents();
     };
 
     // Wait for auth to be initialized
@@ -4,7 +4,8 @@
   const keysToRemove = [];
   for (let i = 0; i < localStorage.length; i++) {
     const key = localStorage.key(i);
-    if (key && (key.startsWith('scorecard:') || key.includes('scorecard'))) {
+    // scorecard:calendar is uploaded and removed by calendar.js
+    if (key && key !== 'scorecard:calendar' && (key.startsWith('scorecard:') || key.includes('scorecard'))) {
       keysToRemove.push(key);
     }
   }
@@ -1,13 +1,33 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Blueprint, Flask, Response, request, jsonify, session, send_from_directory, stream_with_context
+import csv
+import io
 import json
 import os
 import hashlib
+import heapq
+import itertools
 import secrets
-from datetime import datetime, timedelta
-import stripe
+import stat
+import bisect
+import math
+import mmap
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-app = Flask(__name__, static_folder='.')
-app.secret_key = 'scorecard-secret-key-2026-flask'
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+bp = Blueprint('main', __name__)
 
 # Simple in-memory token storage (use Redis in production)
 active_tokens = {}
@@ -19,7 +39,16 @@ STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_YOUR_
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_YOUR_WEBHOOK_SECRET_HERE')
 APP_URL = os.environ.get('APP_URL', 'http://localhost:8000')
 
-stripe.api_key = STRIPE_SECRET_KEY
+_stripe = None
+
+def get_stripe():
+    """Import and configure the Stripe SDK on first use"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = STRIPE_SECRET_KEY
+        _stripe = stripe
+    return _stripe
 
 # Subscription Plans
 SUBSCRIPTION_PLANS = {
@@ -75,7 +104,10 @@ SUBSCRIPTION_PLANS = {
     }
 }
 
-DB_FILE = 'database.json'
+DB_FILE = os.environ.get('DB_FILE', 'database.json')
+# Private runtime files (outbox, indexes) live here, outside the web root
+DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(
+    tempfile.gettempdir(), f'wel-app-{os.getuid()}' if hasattr(os, 'getuid') else 'wel-app')
 
 def hash_password(password):
     """Simple password hashing using SHA256"""
@@ -114,25 +146,786 @@ def init_db():
     with open(DB_FILE, 'r') as f:
         return json.load(f)
 
-def save_db(data):
-    with open(DB_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+def save_db(data, search_ops=()):
+    """Write the database, then log search_ops and the new DB_FILE fingerprint"""
+    with search_lock:
+        get_search_index()  # checked against DB_FILE before it changes
+        with open(DB_FILE, 'w') as f:
+            json.dump(data, f, indent=2)
+        update_search_index(search_ops)
+
+def db_fingerprint():
+    """Identifies the current contents of DB_FILE without reading it"""
+    st = os.stat(DB_FILE)
+    return {'path': os.path.realpath(DB_FILE), 'mtime': st.st_mtime_ns, 'size': st.st_size}
+
+def ensure_private_dir(path):
+    """Create the directory for a private data file.
+
+    DATA_DIR itself is created 0700 and must be a real directory owned by
+    this user, so other local users cannot read reset links or plant files.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid') and os.path.realpath(directory) == os.path.realpath(DATA_DIR):
+        st = os.lstat(DATA_DIR)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise RuntimeError(f'{DATA_DIR} must be a directory owned by this user')
+        if st.st_mode & 0o077:
+            os.chmod(DATA_DIR, 0o700)
+
+def open_private(path, mode='w'):
+    """open() for private data files: created readable by this user only"""
+    return open(path, mode, opener=lambda p, flags: os.open(p, flags, 0o600))
+
+def get_current_user():
+    """Return the logged-in username from the session or the auth token"""
+    if 'user_id' in session:
+        return session['user_id']
+    token = request.headers.get('Authorization') or request.cookies.get('auth_token')
+    if token and token.startswith('Bearer '):
+        token = token.split(' ')[1]
+    return active_tokens.get(token) if token else None
+
+# Rate limiting
+#
+# Token buckets for the auth endpoints, keyed by client IP and by the
+# username/email in the request body. Each rule is (key, capacity, seconds):
+# up to `capacity` requests, refilled evenly over `seconds`.
+RATE_LIMITS = {
+    'login': [('ip', 20, 60), ('username', 5, 300)],
+    'signup': [('ip', 5, 3600)],
+    'forgot_password': [('ip', 5, 900), ('email', 3, 3600)],
+}
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE', os.path.join(tempfile.gettempdir(), 'wel-rate-buckets.bin'))
+RATE_LIMIT_SLOTS = int(os.environ.get('RATE_LIMIT_SLOTS', 8192))  # per rule
+RATE_LIMIT_WAYS = 8
+# Number of reverse proxies in front of the app (Railway and Render add one)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+
+class TokenBucketStore:
+    """Fixed-size tables of token buckets in a memory-mapped file.
+
+    Every gunicorn worker maps the same file, so counters are shared. Each
+    rate-limit rule gets its own table, so e.g. sprayed usernames never
+    compete with IP buckets. A table is split into sets of
+    RATE_LIMIT_WAYS slots holding (key hash, tokens, last refill time); a
+    key hashes (with a secret per-file salt) to one set and owns a slot in
+    it. A new key takes over the fullest bucket in its set and starts full,
+    so it only ever evicts state that carried little or no restriction: a
+    depleted bucket survives until every slot in its set is at least as
+    depleted, and no key is ever charged for another key's requests.
+    """
+    HEADER = struct.Struct('<16s8s')  # salt, layout fingerprint
+    SLOT = struct.Struct('<Qdd')
+
+    def __init__(self, path, tables, slots, ways=RATE_LIMIT_WAYS):
+        self.tables = {name: i for i, name in enumerate(tables)}
+        self.ways = ways
+        self.sets = max(1, slots // ways)
+        self.table_size = self.sets * ways * self.SLOT.size
+        size = self.HEADER.size + self.table_size * len(tables)
+        layout = hashlib.blake2b(json.dumps([tables, self.sets, ways]).encode(), digest_size=8).digest()
+
+        self.file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b')
+        if fcntl:
+            fcntl.lockf(self.file, fcntl.LOCK_EX, self.HEADER.size, 0)
+        try:
+            header = self.file.read(self.HEADER.size)
+            if len(header) < self.HEADER.size or header[16:] != layout or \
+                    os.fstat(self.file.fileno()).st_size != size:
+                # New file or a different rule layout: start from empty tables
+                self.file.truncate(0)
+                self.file.truncate(size)
+                self.file.seek(0)
+                self.file.write(self.HEADER.pack(secrets.token_bytes(16), layout))
+                self.file.flush()
+            self.file.seek(0)
+            self.salt = self.file.read(self.HEADER.size)[:16]
+        finally:
+            if fcntl:
+                fcntl.lockf(self.file, fcntl.LOCK_UN, self.HEADER.size, 0)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.lock = threading.Lock()
+
+    def take(self, table, key, capacity, seconds):
+        """Take a token for key in table. Returns 0 if allowed, else seconds to wait"""
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), key=self.salt, digest_size=8).digest(), 'little') or 1
+        set_offset = (self.HEADER.size + self.tables[table] * self.table_size
+                      + digest % self.sets * self.ways * self.SLOT.size)
+        set_size = self.ways * self.SLOT.size
+        rate = capacity / seconds
+        now = time.time()
+
+        with self.lock:
+            if fcntl:
+                fcntl.lockf(self.file, fcntl.LOCK_EX, set_size, set_offset)
+            try:
+                victim = None
+                for way in range(self.ways):
+                    offset = set_offset + way * self.SLOT.size
+                    owner, tokens, updated = self.SLOT.unpack_from(self.map, offset)
+                    if owner == digest:
+                        break
+                    # Refill lazily for the time since the slot was last used
+                    fullness = capacity if not owner else min(capacity, tokens + max(0, now - updated) * rate)
+                    if victim is None or fullness > victim[1]:
+                        victim = (offset, fullness)
+                else:
+                    offset = victim[0]
+                    tokens, updated = capacity, now
+
+                tokens = min(capacity, tokens + max(0, now - updated) * rate)
+                wait = 0 if tokens >= 1 else (1 - tokens) / rate
+                if not wait:
+                    tokens -= 1
+                self.SLOT.pack_into(self.map, offset, digest, tokens, now)
+            finally:
+                if fcntl:
+                    fcntl.lockf(self.file, fcntl.LOCK_UN, set_size, set_offset)
+        return wait
+
+rate_limiter = None
+
+def get_rate_limiter():
+    global rate_limiter
+    if rate_limiter is None:
+        tables = [f'{route}:{key}' for route in sorted(RATE_LIMITS) for key, _, _ in RATE_LIMITS[route]]
+        rate_limiter = TokenBucketStore(RATE_LIMIT_FILE, tables, RATE_LIMIT_SLOTS)
+    return rate_limiter
+
+def get_client_ip():
+    # ProxyFix (see create_app) has already replaced remote_addr with the
+    # address our own proxy saw; client-supplied X-Forwarded-For is ignored
+    return request.remote_addr or 'unknown'
+
+@bp.before_app_request
+def check_rate_limit():
+    rules = RATE_LIMITS.get((request.endpoint or '').rsplit('.', 1)[-1])
+    if not rules:
+        return None
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    values = {
+        'ip': get_client_ip(),
+        'username': str(data.get('username') or '').strip().lower(),
+        'email': str(data.get('email') or '').strip().lower()
+    }
+
+    route = request.endpoint.rsplit('.', 1)[-1]
+    for key, capacity, seconds in rules:
+        if not values[key]:
+            continue
+        wait = get_rate_limiter().take(f'{route}:{key}', values[key], capacity, seconds)
+        if wait:
+            response = jsonify({'success': False, 'error': 'Too many requests. Please try again later.'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(wait))
+            return response
+    return None
+
+# Background jobs
+#
+# Outgoing email is written to a persistent outbox and delivered by the job
+# scheduler's thread, so a slow mail server never blocks a request. The same
+# scheduler runs periodic maintenance (expired reset tokens, outbox cleanup).
+OUTBOX_FILE = os.environ.get('OUTBOX_FILE', os.path.join(DATA_DIR, 'outbox.json'))
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30           # seconds, doubled after each failed attempt
+OUTBOX_LEASE = 300                # seconds a worker may spend sending a batch
+OUTBOX_RETENTION = 7 * 24 * 3600  # keep delivered/failed messages for a week
+
+SMTP_HOST = os.environ.get('SMTP_HOST')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+SMTP_TIMEOUT = 30
+MAIL_FROM = os.environ.get('MAIL_FROM', 'no-reply@scorecard.com')
+
+class ConsoleTransport:
+    """Prints emails to the log. Used when no SMTP server is configured"""
+
+    def send_batch(self, messages):
+        for message in messages:
+            print(f"\n{'='*60}")
+            print(f"EMAIL to {message['to']}: {message['subject']}")
+            print(f"{'='*60}")
+            print(message['body'])
+            print(f"{'='*60}\n")
+        return {message['id']: None for message in messages}
+
+class SMTPTransport:
+    """Sends a batch of emails over a single SMTP connection"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, sender=MAIL_FROM):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+
+    def send_batch(self, messages):
+        """Returns {message id: error or None}"""
+        import smtplib
+        from email.message import EmailMessage
+
+        results = {}
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                for message in messages:
+                    email = EmailMessage()
+                    email['From'] = self.sender
+                    email['To'] = message['to']
+                    email['Subject'] = message['subject']
+                    email.set_content(message['body'])
+                    try:
+                        smtp.send_message(email)
+                        results[message['id']] = None
+                    except smtplib.SMTPException as e:
+                        results[message['id']] = str(e)
+        except (OSError, smtplib.SMTPException) as e:
+            for message in messages:
+                results.setdefault(message['id'], str(e))
+        return results
+
+def get_mail_transport():
+    if SMTP_HOST:
+        return SMTPTransport(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS)
+    return ConsoleTransport()
+
+class Outbox:
+    """Email queue persisted to a JSON file so queued mail survives restarts.
+
+    Every change re-reads the file under an exclusive file lock, so all
+    workers share one queue. Due messages are leased ('sending') before
+    delivery so each one is sent by a single worker; a lease that is not
+    settled in time (e.g. the worker died) makes the message due again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Yield the current messages under an exclusive lock and save them afterwards"""
+        with self.lock:
+            ensure_private_dir(self.path)
+            with open_private(self.path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    messages = []
+                    if os.path.exists(self.path):
+                        with open(self.path, 'r') as f:
+                            messages = json.load(f)
+                    yield messages
+                    tmp_path = self.path + '.tmp'
+                    with open_private(tmp_path) as f:
+                        json.dump(messages, f, indent=2)
+                    os.replace(tmp_path, self.path)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def enqueue(self, to, subject, body):
+        message = {
+            'id': secrets.token_urlsafe(8),
+            'to': to,
+            'subject': subject,
+            'body': body,
+            'status': 'pending',
+            'attempts': 0,
+            'nextAttempt': time.time(),
+            'createdAt': time.time(),
+            'error': None
+        }
+        with self._locked() as messages:
+            messages.append(message)
+        return message['id']
+
+    def _lease(self, batch_size):
+        """Mark up to batch_size due messages as being sent by this worker"""
+        lease = secrets.token_urlsafe(8)
+        with self._locked() as messages:
+            now = time.time()
+            batch = []
+            for message in messages:
+                if len(batch) >= batch_size:
+                    break
+                due = message['status'] == 'pending' and message['nextAttempt'] <= now
+                expired = message['status'] == 'sending' and message['leaseUntil'] <= now
+                if due or expired:
+                    message.update(status='sending', lease=lease, leaseUntil=now + OUTBOX_LEASE)
+                    batch.append(dict(message))
+        return lease, batch
+
+    def deliver(self, transport, batch_size=OUTBOX_BATCH_SIZE):
+        """Send due messages in batches. Returns the number sent"""
+        sent = 0
+        while True:
+            lease, batch = self._lease(batch_size)
+            if not batch:
+                return sent
+
+            # Send without holding the lock so enqueue() never waits on the mail server
+            results = transport.send_batch(batch)
+
+            with self._locked() as messages:
+                for stored in messages:
+                    if stored.get('lease') != lease or stored['status'] != 'sending':
+                        continue
+                    stored['attempts'] += 1
+                    stored['error'] = results.get(stored['id'], 'Not sent')
+                    stored['lease'] = stored['leaseUntil'] = None
+                    if stored['error'] is None:
+                        stored['status'] = 'sent'
+                        stored['sentAt'] = time.time()
+                        stored['body'] = None  # may hold a live reset link
+                        sent += 1
+                    elif stored['attempts'] >= OUTBOX_MAX_ATTEMPTS:
+                        stored['status'] = 'failed'
+                        stored['body'] = None
+                        print(f"Giving up on email {stored['id']} to {stored['to']}: {stored['error']}")
+                    else:
+                        stored['status'] = 'pending'
+                        stored['nextAttempt'] = time.time() + OUTBOX_RETRY_DELAY * 2 ** (stored['attempts'] - 1)
+
+            if any(results.get(m['id'], 'Not sent') for m in batch):
+                return sent  # leave the rest for the retry schedule
+
+    def compact(self, retention=OUTBOX_RETENTION):
+        """Drop delivered and failed messages older than the retention period"""
+        with self._locked() as messages:
+            cutoff = time.time() - retention
+            kept = [m for m in messages if m['status'] in ('pending', 'sending') or m['createdAt'] > cutoff]
+            removed = len(messages) - len(kept)
+            messages[:] = kept
+        return removed
+
+class JobScheduler:
+    """Runs periodic jobs on a single background thread"""
+
+    def __init__(self):
+        self.jobs = []
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def every(self, seconds, func, on_wake=False):
+        """Run func every `seconds`; jobs with on_wake also run when wake() is called"""
+        self.jobs.append({'interval': seconds, 'func': func, 'on_wake': on_wake,
+                          'next_run': time.time()})
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+                self.thread.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def _run(self):
+        while True:
+            timeout = max(0, min(job['next_run'] for job in self.jobs) - time.time())
+            woken = self.wakeup.wait(timeout)
+            self.wakeup.clear()
+            now = time.time()
+            for job in self.jobs:
+                if job['next_run'] <= now or (woken and job['on_wake']):
+                    job['next_run'] = now + job['interval']
+                    try:
+                        job['func']()
+                    except Exception as e:
+                        print(f"Background job {job['func'].__name__} failed: {e}")
+
+outbox = Outbox(OUTBOX_FILE)
+scheduler = JobScheduler()
+
+def send_email(to, subject, body):
+    """Queue an email for background delivery"""
+    outbox.enqueue(to, subject, body)
+    scheduler.wake()
+
+def deliver_outbox():
+    outbox.deliver(get_mail_transport())
+
+def purge_expired_reset_tokens():
+    now = datetime.now()
+    for token, token_data in list(password_reset_tokens.items()):
+        if datetime.fromisoformat(token_data['expires']) < now:
+            password_reset_tokens.pop(token, None)
+
+def compact_storage():
+    removed = outbox.compact()
+    if removed:
+        print(f"Outbox compacted: removed {removed} old messages")
+    folded = compact_search_index()
+    if folded:
+        print(f"Search index compacted: folded {folded} logged changes")
+
+scheduler.every(60, deliver_outbox, on_wake=True)
+scheduler.every(600, purge_expired_reset_tokens)
+scheduler.every(3600, compact_storage)
 
-# Initialize database
-db = init_db()
+@bp.before_app_request
+def start_background_jobs():
+    scheduler.start()
+
+# Search index
+#
+# Inverted index over discussion posts and direct messages. Postings are
+# grouped by visibility scope: '*' for discussion posts (every user) and a
+# username for each participant of a message, so a query only reads the
+# postings the caller is allowed to see. The index is updated as posts and
+# messages are appended. It is persisted in DATA_DIR as a snapshot
+# (SEARCH_INDEX_FILE) plus an append-only log of changes since then, which
+# compact_storage periodically folds back into the snapshot. Both record the
+# db_fingerprint() they match; any other DB_FILE contents trigger a rebuild.
+# Workers share both files under search_files_locked(); a worker's in-memory
+# index picks up other workers' changes when it next compacts the log.
+SEARCH_INDEX_FILE = os.environ.get('SEARCH_INDEX_FILE', os.path.join(
+    DATA_DIR, f"search_index-{hashlib.blake2b(os.path.realpath(DB_FILE).encode(), digest_size=6).hexdigest()}.json"))
+SEARCH_LOG_FILE = SEARCH_INDEX_FILE + '.log'
+SEARCH_SNIPPET_LENGTH = 200
+SEARCH_MAX_RESULTS = 50
+SEARCH_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with'
+}
+PUBLIC_SCOPE = '*'
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", (text or '').lower())
+            if len(t) > 1 and t not in SEARCH_STOPWORDS]
+
+def doc_digest(text, scopes, fields):
+    """Fingerprint of an indexed doc, used to skip unchanged docs on bulk saves"""
+    payload = json.dumps([text, sorted(scopes), fields], sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+class SearchIndex:
+    """Term -> scope -> {doc id: term frequency}"""
+
+    def __init__(self, postings=None, docs=None, source=None):
+        self.postings = postings or {}
+        self.docs = docs or {}  # doc id -> stored fields, scopes and terms
+        self.source = source  # db_fingerprint() of the DB the docs came from
+        self.doc_freq = {}
+        for term, scopes in self.postings.items():
+            self.doc_freq[term] = len(set().union(*scopes.values()))
+
+    def add(self, doc_id, text, scopes, fields):
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        counts = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            term_scopes = self.postings.setdefault(term, {})
+            for scope in scopes:
+                term_scopes.setdefault(scope, {})[doc_id] = tf
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+        self.docs[doc_id] = dict(fields, snippet=(text or '')[:SEARCH_SNIPPET_LENGTH],
+                                 scopes=list(scopes), terms=list(counts),
+                                 digest=doc_digest(text, scopes, fields))
+
+    def remove(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if not doc:
+            return
+        for term in doc['terms']:
+            term_scopes = self.postings.get(term, {})
+            for scope in doc['scopes']:
+                term_scopes.get(scope, {}).pop(doc_id, None)
+                if not term_scopes.get(scope, True):
+                    del term_scopes[scope]
+            self.doc_freq[term] -= 1
+            if not self.doc_freq[term]:
+                del self.doc_freq[term]
+                self.postings.pop(term, None)
+
+    def search(self, query, username, doc_type=None, limit=20):
+        """Return the best matching docs containing every query term"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        visible = {}
+        for term in terms:
+            term_scopes = self.postings.get(term, {})
+            postings = dict(term_scopes.get(PUBLIC_SCOPE, {}))
+            postings.update(term_scopes.get(username, {}))
+            if not postings:
+                return []
+            visible[term] = postings
+
+        # Intersect starting from the rarest term
+        ordered = sorted(visible, key=lambda t: len(visible[t]))
+        candidates = set(visible[ordered[0]])
+        for term in ordered[1:]:
+            candidates.intersection_update(visible[term])
+            if not candidates:
+                return []
+
+        total = len(self.docs)
+        idf = {term: math.log(1 + total / self.doc_freq[term]) for term in terms}
+        scored = (
+            (sum(visible[term][doc_id] * idf[term] for term in terms), doc_id)
+            for doc_id in candidates
+            if not doc_type or self.docs[doc_id]['type'] == doc_type
+        )
+        results = []
+        for score, doc_id in heapq.nlargest(limit, scored):
+            doc = self.docs[doc_id]
+            result = {k: v for k, v in doc.items() if k not in ('scopes', 'terms', 'digest')}
+            result['score'] = round(score, 4)
+            results.append(result)
+        return results
+
+search_index = None
+search_lock = threading.RLock()
+
+@contextmanager
+def search_files_locked():
+    """Hold the lock that orders snapshot and log access across workers"""
+    with search_lock:
+        ensure_private_dir(SEARCH_INDEX_FILE)
+        with open_private(SEARCH_INDEX_FILE + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def discussion_posts():
+    posts = db.get('discussions', [])
+    return posts if isinstance(posts, list) else list(posts.values())
+
+def post_doc(post):
+    """(doc id, text, scopes, fields) for a discussion post"""
+    return f"post:{post.get('id')}", post.get('content'), [PUBLIC_SCOPE], {
+        'type': 'discussion',
+        'id': post.get('id'),
+        'author': post.get('author'),
+        'timestamp': post.get('timestamp')
+    }
+
+def message_scopes(message):
+    """Only the sender and recipient may see a message; never the public scope"""
+    participants = {message.get('from'), message.get('to')}
+    return [user for user in participants if isinstance(user, str) and user and user != PUBLIC_SCOPE]
+
+def message_doc(conversation, position, message):
+    """(doc id, text, scopes, fields) for a direct message"""
+    return f'message:{conversation}:{position}', message.get('text'), message_scopes(message), {
+        'type': 'message',
+        'conversation': conversation,
+        'from': message.get('from'),
+        'to': message.get('to'),
+        'timestamp': message.get('timestamp')
+    }
+
+def discussion_docs():
+    for post in discussion_posts():
+        yield post_doc(post)
+
+def message_docs():
+    for conversation, messages in db.get('messages', {}).items():
+        if isinstance(messages, list):
+            for position, message in enumerate(messages):
+                yield message_doc(conversation, position, message)
+
+def add_op(doc):
+    doc_id, text, scopes, fields = doc
+    return {'op': 'add', 'id': doc_id, 'text': text, 'scopes': scopes, 'fields': fields}
+
+def apply_op(index, op):
+    if op['op'] == 'add':
+        index.add(op['id'], op['text'], op['scopes'], op['fields'])
+    elif op['op'] == 'source':
+        index.source = op['fingerprint']
+    else:
+        index.remove(op['id'])
+
+def update_search_index(ops):
+    """Apply ops to the index and append them to SEARCH_LOG_FILE.
+
+    Called by save_db after every write, so the log ends with the
+    fingerprint of the DB it matches. Costs O(changed docs): the full index
+    is only rewritten when the log is compacted by the background
+    compact_storage job.
+    """
+    with search_lock:
+        index = get_search_index()
+        ops = list(ops) + [{'op': 'source', 'fingerprint': db_fingerprint()}]
+        for op in ops:
+            apply_op(index, op)
+        with search_files_locked(), open_private(SEARCH_LOG_FILE, 'a') as f:
+            f.writelines(json.dumps(op) + '\n' for op in ops)
+
+def diff_search_docs(doc_type, docs):
+    """Ops that bring the indexed docs of doc_type in line with docs"""
+    index = get_search_index()
+    wanted = set()
+    ops = []
+    for doc in docs:
+        wanted.add(doc[0])
+        indexed = index.docs.get(doc[0])
+        if not indexed or indexed.get('digest') != doc_digest(*doc[1:]):
+            ops.append(add_op(doc))
+    for doc_id, indexed in index.docs.items():
+        if indexed['type'] == doc_type and doc_id not in wanted:
+            ops.append({'op': 'remove', 'id': doc_id})
+    return ops
+
+def rebuild_search_index():
+    global search_index
+    with search_lock:
+        search_index = SearchIndex(source=db_fingerprint())
+        for doc in itertools.chain(discussion_docs(), message_docs()):
+            search_index.add(*doc)
+        with search_files_locked():
+            write_search_snapshot()
+        return search_index
+
+def read_search_files():
+    """Load the snapshot and replay the log. Call with search_files_locked()"""
+    if not os.path.exists(SEARCH_INDEX_FILE):
+        return None
+    with open(SEARCH_INDEX_FILE, 'r') as f:
+        saved = json.load(f)
+    index = SearchIndex(saved['postings'], saved['docs'], saved.get('source'))
+    if os.path.exists(SEARCH_LOG_FILE):
+        with open(SEARCH_LOG_FILE, 'r') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash
+                apply_op(index, op)
+    return index
+
+def get_search_index():
+    """Load the snapshot and replay the log, rebuilding if missing or out of date"""
+    global search_index
+    with search_lock:
+        if search_index is None:
+            with search_files_locked():
+                search_index = read_search_files()
+            if search_index is None or search_index.source != db_fingerprint():
+                rebuild_search_index()
+        return search_index
+
+def write_search_snapshot():
+    """Write the whole index and start a new, empty log. Call with search_files_locked()"""
+    tmp_path = SEARCH_INDEX_FILE + '.tmp'
+    with open_private(tmp_path) as f:
+        json.dump({'postings': search_index.postings, 'docs': search_index.docs,
+                   'source': search_index.source}, f)
+    os.replace(tmp_path, SEARCH_INDEX_FILE)
+    # Replaying ops already in the snapshot is harmless, so a crash here is safe
+    if os.path.exists(SEARCH_LOG_FILE):
+        os.remove(SEARCH_LOG_FILE)
+
+def compact_search_index():
+    """Fold the log into a new snapshot. Returns the number of ops folded.
+
+    Other workers append to the same log, so the snapshot is rebuilt from
+    the files rather than from this worker's copy, which also picks up
+    their changes here.
+    """
+    global search_index
+    with search_files_locked():
+        if search_index is None or not os.path.exists(SEARCH_LOG_FILE):
+            return 0
+        with open(SEARCH_LOG_FILE, 'r') as f:
+            folded = sum(1 for _ in f)
+        search_index = read_search_files() or search_index
+        write_search_snapshot()
+        return folded
+
+# Data loading
+#
+# The JSON database is loaded in a background thread started by create_app(),
+# so the server accepts connections (and answers /healthz) straight away.
+# Requests that need data wait for the load, or trigger it if nothing has.
+db = {}
+db_ready = threading.Event()
+db_load_lock = threading.Lock()
+db_load_error = None
+DB_FREE_ENDPOINTS = {'main.healthz', 'main.readyz', 'main.index', 'main.static_files'}
+
+def load_db():
+    """Load the database into `db` once. Safe to call from any thread"""
+    global db_load_error
+    with db_load_lock:
+        if db_ready.is_set():
+            return
+        try:
+            db.update(init_db())
+        except Exception as e:
+            db_load_error = str(e)
+            raise
+        db_load_error = None
+        db_ready.set()
+
+def load_db_in_background():
+    try:
+        load_db()
+    except Exception as e:
+        print(f"Database load failed: {e}")
+
+@bp.before_app_request
+def ensure_db_loaded():
+    if not db_ready.is_set() and request.endpoint not in DB_FREE_ENDPOINTS:
+        load_db()
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    if db_ready.is_set():
+        return jsonify({'status': 'ready'})
+    return jsonify({'status': 'loading', 'error': db_load_error}), 503
 
 # Serve static files
-@app.route('/')
+@bp.route('/')
 def index():
     return send_from_directory('.', 'index.html')
 
-@app.route('/<path:path>')
+@bp.route('/<path:path>')
 def static_files(path):
+    if is_private_file(path):
+        return jsonify({'error': 'Not found'}), 404
     return send_from_directory('.', path)
 
+def is_private_file(path):
+    """True for data files that must never be served, even if kept in the web root"""
+    full_path = os.path.realpath(path)
+    private_files = (DB_FILE, OUTBOX_FILE, SEARCH_INDEX_FILE)
+    if any(full_path.startswith(os.path.realpath(p)) for p in private_files):
+        return True  # also covers the .tmp files written next to them
+    return full_path.startswith(os.path.realpath(DATA_DIR) + os.sep)
+
 # API Routes
 
-@app.route('/api/auth/status', methods=['GET'])
+@bp.route('/api/auth/status', methods=['GET'])
 def auth_status():
     token = request.headers.get('Authorization') or request.cookies.get('auth_token')
     print(f"Auth status check - token: {token}")
@@ -158,11 +951,15 @@ def auth_status():
     print("No valid token - returning not logged in")
     return jsonify({'loggedIn': False})
 
-@app.route('/api/auth/login', methods=['POST'])
+@bp.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
     username = data.get('username')
     password = data.get('password')
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'success': False, 'error': 'Invalid username or password'}), 401
     
     user = db['users'].get(username)
     if not user:
@@ -198,9 +995,11 @@ def login():
     
     return response
 
-@app.route('/api/auth/signup', methods=['POST'])
+@bp.route('/api/auth/signup', methods=['POST'])
 def signup():
     data = request.json
+    if not isinstance(data, dict) or not all(isinstance(data.get(k, ''), str) for k in ('username', 'password', 'email')):
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
     username = data.get('username', '').strip()
     password = data.get('password', '')
     email = data.get('email', '').strip()
@@ -238,7 +1037,7 @@ def signup():
     save_db(db)
     return jsonify({'success': True})
 
-@app.route('/api/auth/update-details', methods=['POST'])
+@bp.route('/api/auth/update-details', methods=['POST'])
 def update_details():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -259,7 +1058,7 @@ def update_details():
     save_db(db)
     return jsonify({'success': True})
 
-@app.route('/api/auth/logout', methods=['POST'])
+@bp.route('/api/auth/logout', methods=['POST'])
 def logout():
     token = request.headers.get('Authorization') or request.cookies.get('auth_token')
     if token and token in active_tokens:
@@ -268,9 +1067,11 @@ def logout():
     response.set_cookie('auth_token', '', expires=0)
     return response
 
-@app.route('/api/auth/forgot-password', methods=['POST'])
+@bp.route('/api/auth/forgot-password', methods=['POST'])
 def forgot_password():
     data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('email', ''), str):
+        return jsonify({'success': False, 'error': 'Valid email is required'}), 400
     email = data.get('email', '').strip().lower()
     
     if not email or '@' not in email:
@@ -301,26 +1102,16 @@ def forgot_password():
     # Create reset link
     reset_link = f"{APP_URL}/reset-password.html?token={reset_token}"
     
-    # In production, send actual email. For now, just log it
-    print(f"\n{'='*60}")
-    print(f"PASSWORD RESET REQUEST")
-    print(f"{'='*60}")
-    print(f"Email: {email}")
-    print(f"Username: {username}")
-    print(f"Reset Link: {reset_link}")
-    print(f"Token expires in 1 hour")
-    print(f"{'='*60}\n")
-    
-    # TODO: Integrate with email service (SendGrid, AWS SES, etc.)
-    # send_email(
-    #     to=email,
-    #     subject="Reset Your Password - Scorecard",
-    #     body=f"Click here to reset your password: {reset_link}\n\nThis link expires in 1 hour."
-    # )
+    send_email(
+        to=email,
+        subject="Reset Your Password - Scorecard",
+        body=f"Click here to reset your password: {reset_link}\n\nThis link expires in 1 hour."
+    )
+    print(f"Password reset email queued for user: {username}")
     
     return jsonify({'success': True, 'message': 'Password reset link sent to your email'})
 
-@app.route('/api/auth/reset-password', methods=['POST'])
+@bp.route('/api/auth/reset-password', methods=['POST'])
 def reset_password():
     data = request.json
     token = data.get('token')
@@ -360,7 +1151,7 @@ def reset_password():
     
     return jsonify({'success': True, 'message': 'Password has been reset successfully'})
 
-@app.route('/api/profile', methods=['GET'])
+@bp.route('/api/profile', methods=['GET'])
 def get_profile():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -372,7 +1163,7 @@ def get_profile():
     })
     return jsonify(profile)
 
-@app.route('/api/profile', methods=['POST'])
+@bp.route('/api/profile', methods=['POST'])
 def update_profile():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -387,7 +1178,7 @@ def update_profile():
     save_db(db)
     return jsonify({'success': True})
 
-@app.route('/api/account', methods=['DELETE'])
+@bp.route('/api/account', methods=['DELETE'])
 def delete_account():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -404,7 +1195,7 @@ def delete_account():
     
     return jsonify({'success': True})
 
-@app.route('/api/admin/users', methods=['GET'])
+@bp.route('/api/admin/users', methods=['GET'])
 def get_all_users():
     # Check for token-based auth
     auth_header = request.headers.get('Authorization')
@@ -438,7 +1229,7 @@ def get_all_users():
     
     return jsonify(users)
 
-@app.route('/api/admin/users/<username>', methods=['DELETE'])
+@bp.route('/api/admin/users/<username>', methods=['DELETE'])
 def delete_user():
     # Check for token-based auth
     auth_header = request.headers.get('Authorization')
@@ -474,7 +1265,7 @@ def delete_user():
     
     return jsonify({'success': True})
 
-@app.route('/api/admin/users/<username>/reset-password', methods=['POST'])
+@bp.route('/api/admin/users/<username>/reset-password', methods=['POST'])
 def admin_reset_password():
     # Check for token-based auth
     auth_header = request.headers.get('Authorization')
@@ -502,7 +1293,7 @@ def admin_reset_password():
     
     return jsonify({'success': True})
 
-@app.route('/api/admin/users/<username>/scorecard', methods=['GET'])
+@bp.route('/api/admin/users/<username>/scorecard', methods=['GET'])
 def get_user_scorecard():
     # Check for token-based auth
     auth_header = request.headers.get('Authorization')
@@ -521,7 +1312,7 @@ def get_user_scorecard():
     return jsonify(scorecard)
 
 # Scorecard/Metrics API
-@app.route('/api/scorecard', methods=['GET'])
+@bp.route('/api/scorecard', methods=['GET'])
 def get_scorecard():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -530,7 +1321,7 @@ def get_scorecard():
     scorecard = db.get('scorecards', {}).get(username, {})
     return jsonify(scorecard)
 
-@app.route('/api/scorecard', methods=['POST'])
+@bp.route('/api/scorecard', methods=['POST'])
 def save_scorecard():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -547,7 +1338,7 @@ def save_scorecard():
     return jsonify({'success': True})
 
 # Discussions API
-@app.route('/api/discussions', methods=['GET'])
+@bp.route('/api/discussions', methods=['GET'])
 def get_discussions():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -555,7 +1346,7 @@ def get_discussions():
     discussions = db.get('discussions', {})
     return jsonify(discussions)
 
-@app.route('/api/discussions', methods=['POST'])
+@bp.route('/api/discussions', methods=['POST'])
 def save_discussions():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -566,38 +1357,477 @@ def save_discussions():
         db['discussions'] = {}
     
     db['discussions'] = data
-    save_db(db)
+    save_db(db, diff_search_docs('discussion', discussion_docs()))
     
     return jsonify({'success': True})
 
+@bp.route('/api/discussions/posts', methods=['POST'])
+def create_post():
+    username = get_current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    data = request.json or {}
+    if not isinstance(data, dict) or not isinstance(data.get('content') or '', str):
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
+    content = (data.get('content') or '').strip()
+    if not content and not data.get('media'):
+        return jsonify({'success': False, 'error': 'Post cannot be empty'}), 400
+    
+    post = {
+        'id': secrets.token_urlsafe(8),
+        'author': username,
+        'content': content,
+        'media': data.get('media'),
+        'timestamp': datetime.now().isoformat(),
+        'likes': 0
+    }
+    
+    db['discussions'] = discussion_posts()
+    db['discussions'].append(post)
+    save_db(db, [add_op(post_doc(post))])
+    
+    return jsonify({'success': True, 'post': post}), 201
+
 # Calendar API
-@app.route('/api/calendar', methods=['GET'])
+#
+# Each user's events live in db['calendar'][username]['events'] keyed by id.
+# A date-sorted index is built in memory per user so month views only touch
+# the events inside the requested window.
+MAX_CALENDAR_RANGE_DAYS = 366
+RECURRENCE_FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+
+# The admin's events are shared: they appear on every user's calendar
+SHARED_CALENDAR_USER = 'admin'
+
+calendar_indexes = {}
+
+def calendar_owners(username):
+    """Users whose events appear on username's calendar"""
+    if username == SHARED_CALENDAR_USER:
+        return [username]
+    return [username, SHARED_CALENDAR_USER]
+
+class CalendarIndex:
+    """Sorted date index over one user's calendar events"""
+
+    def __init__(self, events):
+        self.dates = []      # sorted dates that have at least one single event
+        self.by_date = {}    # date -> [event ids]
+        self.recurring = {}  # event id -> start date
+        for event in events.values():
+            self.add(event)
+
+    def add(self, event):
+        if event.get('recurrence'):
+            self.recurring[event['id']] = event['date']
+            return
+        ids = self.by_date.get(event['date'])
+        if ids is None:
+            ids = self.by_date[event['date']] = []
+            bisect.insort(self.dates, event['date'])
+        ids.append(event['id'])
+
+    def remove(self, event):
+        if event['id'] in self.recurring:
+            del self.recurring[event['id']]
+            return
+        ids = self.by_date.get(event['date'], [])
+        if event['id'] in ids:
+            ids.remove(event['id'])
+        if not ids and event['date'] in self.by_date:
+            del self.by_date[event['date']]
+            del self.dates[bisect.bisect_left(self.dates, event['date'])]
+
+    def single_ids(self, start, end):
+        lo = bisect.bisect_left(self.dates, start)
+        hi = bisect.bisect_right(self.dates, end)
+        for day in self.dates[lo:hi]:
+            yield from self.by_date[day]
+
+def get_user_calendar(username):
+    """Return the user's stored calendar, migrating older formats"""
+    if 'calendar' not in db:
+        db['calendar'] = {}
+    calendar = db['calendar'].get(username)
+    if not isinstance(calendar, dict) or not isinstance(calendar.get('events'), dict):
+        legacy = calendar.get('events', []) if isinstance(calendar, dict) else calendar
+        calendar = {'events': {}}
+        for event in legacy if isinstance(legacy, list) else []:
+            event, error = validate_calendar_event(event)
+            if not error:
+                calendar['events'][event['id']] = event
+        db['calendar'][username] = calendar
+    return calendar
+
+def get_calendar_index(username):
+    if username not in calendar_indexes:
+        calendar_indexes[username] = CalendarIndex(get_user_calendar(username)['events'])
+    return calendar_indexes[username]
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def validate_calendar_event(data, event_id=None):
+    """Normalize an event payload. Returns (event, error)"""
+    if not isinstance(data, dict):
+        return None, 'Invalid event'
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return None, 'Title is required'
+    description = data.get('description') or ''
+    if not isinstance(description, str):
+        return None, 'Description must be text'
+    start = parse_date(data.get('date'))
+    if not start:
+        return None, 'Valid date (YYYY-MM-DD) is required'
+
+    event = {
+        'id': event_id or str(data.get('id') or secrets.token_urlsafe(8)),
+        'title': title.strip(),
+        # Stored as YYYY-MM-DD: the index compares dates as strings
+        'date': start.isoformat(),
+        'description': description
+    }
+
+    recurrence = data.get('recurrence')
+    if recurrence:
+        if not isinstance(recurrence, dict) or recurrence.get('freq') not in RECURRENCE_FREQUENCIES:
+            return None, 'Recurrence freq must be one of: ' + ', '.join(RECURRENCE_FREQUENCIES)
+        try:
+            interval = int(recurrence.get('interval', 1))
+            count = int(recurrence['count']) if recurrence.get('count') else None
+        except (TypeError, ValueError):
+            return None, 'Recurrence interval and count must be numbers'
+        if interval < 1 or (count is not None and count < 1):
+            return None, 'Recurrence interval and count must be positive'
+        until = None
+        if recurrence.get('until'):
+            until = parse_date(recurrence['until'])
+            if not until:
+                return None, 'Recurrence until must be a date (YYYY-MM-DD)'
+        event['recurrence'] = {'freq': recurrence['freq'], 'interval': interval,
+                               'count': count, 'until': until.isoformat() if until else None}
+
+    return event, None
+
+def expand_recurrence(event, start, end):
+    """Yield occurrence dates of a recurring event that fall within [start, end].
+
+    Monthly and yearly rules land on the last day of the month when the
+    start day does not exist there (e.g. the 31st in April, Feb 29 in a
+    non-leap year), so every period has exactly one occurrence and `count`
+    counts real dates.
+    """
+    rule = event['recurrence']
+    first = date.fromisoformat(event['date'])
+    if rule.get('until'):
+        end = min(end, date.fromisoformat(rule['until']))
+    count = rule.get('count')
+    interval = rule.get('interval', 1)
+
+    if rule['freq'] in ('daily', 'weekly'):
+        step = interval * (7 if rule['freq'] == 'weekly' else 1)
+        n = max(0, -(-(start - first).days // step))
+        while count is None or n < count:
+            occurrence = first + timedelta(days=n * step)
+            if occurrence > end:
+                break
+            yield occurrence
+            n += 1
+    else:
+        step = interval * (12 if rule['freq'] == 'yearly' else 1)
+        months_to_start = (start.year - first.year) * 12 + start.month - first.month
+        n = max(0, months_to_start // step)
+        while count is None or n < count:
+            years, month = divmod(first.month - 1 + n * step, 12)
+            n += 1
+            year, month = first.year + years, month + 1
+            if date(year, month, 1) > end:
+                break
+            occurrence = date(year, month, min(first.day, monthrange(year, month)[1]))
+            if start <= occurrence <= end:
+                yield occurrence
+
+def query_calendar(username, start, end):
+    """Return the user's events between start and end (inclusive), sorted by date"""
+    events = get_user_calendar(username)['events']
+    index = get_calendar_index(username)
+    results = [events[event_id] for event_id in index.single_ids(start.isoformat(), end.isoformat())]
+    for event_id, first in index.recurring.items():
+        if first > end.isoformat():
+            continue
+        event = events[event_id]
+        for occurrence in expand_recurrence(event, start, end):
+            results.append(dict(event, date=occurrence.isoformat()))
+    results.sort(key=lambda e: e['date'])
+    return results
+
+@bp.route('/api/calendar', methods=['GET'])
 def get_calendar():
-    if 'user_id' not in session:
+    username = get_current_user()
+    if not username:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    username = session['user_id']
-    calendar = db.get('calendar', {}).get(username, {})
-    return jsonify(calendar)
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    owners = calendar_owners(username)
+    if not date_from and not date_to:
+        events = [dict(e, shared=owner != username)
+                  for owner in owners for e in get_user_calendar(owner)['events'].values()]
+        return jsonify({'events': sorted(events, key=lambda e: e['date'])})
+    
+    start = parse_date(date_from)
+    end = parse_date(date_to)
+    if not start or not end or end < start:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD) with from <= to'}), 400
+    if (end - start).days > MAX_CALENDAR_RANGE_DAYS:
+        return jsonify({'error': f'Range cannot exceed {MAX_CALENDAR_RANGE_DAYS} days'}), 400
+    
+    events = [dict(e, shared=owner != username)
+              for owner in owners for e in query_calendar(owner, start, end)]
+    return jsonify({'events': sorted(events, key=lambda e: e['date'])})
 
-@app.route('/api/calendar', methods=['POST'])
+@bp.route('/api/calendar', methods=['POST'])
 def save_calendar():
-    if 'user_id' not in session:
+    username = get_current_user()
+    if not username:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
-    username = session['user_id']
     data = request.json
+    events = data.get('events') if isinstance(data, dict) else data
     
     if 'calendar' not in db:
         db['calendar'] = {}
     
-    db['calendar'][username] = data
+    db['calendar'][username] = events if isinstance(events, list) else []
+    calendar_indexes.pop(username, None)
+    get_user_calendar(username)
+    save_db(db)
+    
+    return jsonify({'success': True})
+
+@bp.route('/api/calendar/events', methods=['POST'])
+def create_calendar_event():
+    username = get_current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Invalid event'}), 400
+    
+    event, error = validate_calendar_event({k: v for k, v in data.items() if k != 'id'})
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    index = get_calendar_index(username)
+    get_user_calendar(username)['events'][event['id']] = event
+    index.add(event)
+    save_db(db)
+    
+    return jsonify({'success': True, 'event': event}), 201
+
+@bp.route('/api/calendar/events/<event_id>', methods=['PUT'])
+def update_calendar_event(event_id):
+    username = get_current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    events = get_user_calendar(username)['events']
+    if event_id not in events:
+        return jsonify({'success': False, 'error': 'Event not found'}), 404
+    
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Invalid event'}), 400
+    
+    event, error = validate_calendar_event(dict(events[event_id], **data), event_id)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    index = get_calendar_index(username)
+    index.remove(events[event_id])
+    events[event_id] = event
+    index.add(event)
+    save_db(db)
+    
+    return jsonify({'success': True, 'event': event})
+
+@bp.route('/api/calendar/events/<event_id>', methods=['DELETE'])
+def delete_calendar_event(event_id):
+    username = get_current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    events = get_user_calendar(username)['events']
+    if event_id not in events:
+        return jsonify({'success': False, 'error': 'Event not found'}), 404
+    
+    get_calendar_index(username).remove(events.pop(event_id))
     save_db(db)
     
     return jsonify({'success': True})
 
+# Export API
+#
+# Exports are streamed row by row from generators, so large histories and
+# full-tenant exports never build the whole file in memory.
+EXPORT_PLANS = ('basic', 'pro')
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_CHUNK_SIZE = 64 * 1024
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+EXPORT_FIELDS = {
+    'scorecard': ['username', 'timestamp', 'date', 'category', 'rating', 'average'],
+    'calendar': ['username', 'id', 'date', 'title', 'description', 'recurrence'],
+    'profile': ['username', 'email', 'createdAt', 'organization', 'jobTitle', 'phone',
+                'plan', 'displayName', 'bio'],
+}
+
+def export_scorecard_rows(username):
+    for entry in db.get('scorecards', {}).get(username, {}).get('history', []):
+        for category, rating in entry.get('ratings', {}).items():
+            yield {
+                'username': username,
+                'timestamp': entry.get('timestamp'),
+                'date': entry.get('date'),
+                'category': category,
+                'rating': rating,
+                'average': entry.get('average')
+            }
+
+def export_calendar_rows(username):
+    calendar = db.get('calendar', {}).get(username)
+    if isinstance(calendar, dict):
+        calendar = calendar.get('events', {})
+    events = calendar.values() if isinstance(calendar, dict) else calendar or []
+    for event in events:
+        recurrence = event.get('recurrence') or {}
+        yield {
+            'username': username,
+            'id': event.get('id'),
+            'date': event.get('date'),
+            'title': event.get('title'),
+            'description': event.get('description'),
+            'recurrence': recurrence.get('freq')
+        }
+
+def export_profile_rows(username):
+    user = db['users'].get(username)
+    if not user:
+        return
+    profile = db.get('profiles', {}).get(username, {})
+    yield {
+        'username': username,
+        'email': user.get('email'),
+        'createdAt': user.get('createdAt'),
+        'organization': user.get('organization'),
+        'jobTitle': user.get('jobTitle'),
+        'phone': user.get('phone'),
+        'plan': user.get('subscription', {}).get('plan', 'free'),
+        'displayName': profile.get('displayName'),
+        'bio': profile.get('bio')
+    }
+
+EXPORT_ROWS = {
+    'scorecard': export_scorecard_rows,
+    'calendar': export_calendar_rows,
+    'profile': export_profile_rows,
+}
+
+def csv_safe(value):
+    """Stop spreadsheets from running user text as a formula"""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def encode_export(dataset, usernames, fmt):
+    """Yield the export as byte chunks of roughly EXPORT_CHUNK_SIZE"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS[dataset], extrasaction='ignore')
+        writer.writeheader()
+
+    for username in usernames:
+        for row in EXPORT_ROWS[dataset](username):
+            if writer:
+                writer.writerow({k: csv_safe(v) for k, v in row.items()})
+            else:
+                buffer.write(json.dumps(row) + '\n')
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(dataset, usernames, name):
+    """Build a streaming (chunked) export response, or an error tuple"""
+    if dataset not in EXPORT_ROWS:
+        return jsonify({'error': 'Unknown export. Use one of: ' + ', '.join(EXPORT_ROWS)}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format must be one of: ' + ', '.join(EXPORT_FORMATS)}), 400
+
+    chunks = encode_export(dataset, usernames, fmt)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f'{name}-{dataset}.{fmt}'
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+@bp.route('/api/export/<dataset>', methods=['GET'])
+def export_data(dataset):
+    username = get_current_user()
+    if not username:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    user = db['users'].get(username)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    plan = user.get('subscription', {}).get('plan', 'free')
+    if plan not in EXPORT_PLANS and username != 'admin':
+        return jsonify({'error': 'Export data requires a Basic or Pro plan'}), 403
+    
+    return export_response(dataset, [username], username)
+
+@bp.route('/api/admin/export/<dataset>', methods=['GET'])
+def admin_export_data(dataset):
+    # Check for token-based auth
+    auth_header = request.headers.get('Authorization')
+    token = auth_header.split(' ')[1] if auth_header and auth_header.startswith('Bearer ') else None
+    
+    if not token or token not in active_tokens:
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    user_id = active_tokens[token]
+    if user_id != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    # Snapshot the usernames so the stream is not affected by signups mid-export
+    return export_response(dataset, list(db['users']), 'all-users')
+
 # Messages API
-@app.route('/api/messages', methods=['GET'])
+@bp.route('/api/messages', methods=['GET'])
 def get_messages():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -605,7 +1835,7 @@ def get_messages():
     messages = db.get('messages', {})
     return jsonify(messages)
 
-@app.route('/api/messages', methods=['POST'])
+@bp.route('/api/messages', methods=['POST'])
 def save_messages():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
@@ -614,19 +1844,80 @@ def save_messages():
     
     if 'messages' not in db:
         db['messages'] = {}
+    
+    db['messages'] = data
+    save_db(db, diff_search_docs('message', message_docs()))
+    
+    return jsonify({'success': True})
+
+@bp.route('/api/messages/send', methods=['POST'])
+def send_message():
+    username = get_current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    data = request.json or {}
+    if not isinstance(data, dict) or not all(isinstance(data.get(k) or '', str) for k in ('to', 'text')):
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
+    to_user = data.get('to')
+    text = (data.get('text') or '').strip()
+    
+    if not text:
+        return jsonify({'success': False, 'error': 'Message cannot be empty'}), 400
+    if to_user not in db['users'] or to_user == username:
+        return jsonify({'success': False, 'error': 'Recipient not found'}), 404
+    
+    message = {
+        'from': username,
+        'to': to_user,
+        'text': text,
+        'timestamp': int(time.time() * 1000)
+    }
+    
+    if 'messages' not in db:
+        db['messages'] = {}
+    conversation = '::'.join(sorted([username, to_user]))
+    db['messages'].setdefault(conversation, []).append(message)
+    save_db(db, [add_op(message_doc(conversation, len(db['messages'][conversation]) - 1, message))])
+    
+    return jsonify({'success': True, 'message': message}), 201
+
+# Search API
+@bp.route('/api/search', methods=['GET'])
+def search():
+    username = get_current_user()
+    if not username:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query is required'}), 400
+    
+    doc_type = request.args.get('type')
+    if doc_type not in (None, 'discussion', 'message'):
+        return jsonify({'error': 'Type must be discussion or message'}), 400
+    
+    try:
+        limit = min(int(request.args.get('limit', 20)), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'Limit must be a number'}), 400
+    
+    results = get_search_index().search(query, username, doc_type, max(limit, 1))
+    return jsonify({'query': query, 'results': results})
+
 # Stripe API Routes
 
-@app.route('/api/stripe/config', methods=['GET'])
+@bp.route('/api/stripe/config', methods=['GET'])
 def stripe_config():
     return jsonify({
         'publishableKey': STRIPE_PUBLISHABLE_KEY
     })
 
-@app.route('/api/stripe/plans', methods=['GET'])
+@bp.route('/api/stripe/plans', methods=['GET'])
 def get_plans():
     return jsonify(SUBSCRIPTION_PLANS)
 
-@app.route('/api/subscription/status', methods=['GET'])
+@bp.route('/api/subscription/status', methods=['GET'])
 def subscription_status():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -646,7 +1937,7 @@ def subscription_status():
     
     return jsonify(subscription)
 
-@app.route('/api/stripe/create-checkout-session', methods=['POST'])
+@bp.route('/api/stripe/create-checkout-session', methods=['POST'])
 def create_checkout_session():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -667,6 +1958,7 @@ def create_checkout_session():
     user = db['users'].get(username)
     
     try:
+        stripe = get_stripe()
         # Create or retrieve Stripe customer
         customer_id = user.get('subscription', {}).get('stripeCustomerId')
         
@@ -701,7 +1993,7 @@ def create_checkout_session():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/stripe/create-portal-session', methods=['POST'])
+@bp.route('/api/stripe/create-portal-session', methods=['POST'])
 def create_portal_session():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -714,6 +2006,7 @@ def create_portal_session():
         return jsonify({'error': 'No subscription found'}), 404
     
     try:
+        stripe = get_stripe()
         portal_session = stripe.billing_portal.Session.create(
             customer=customer_id,
             return_url=f'{APP_URL}/dashboard.html'
@@ -724,10 +2017,11 @@ def create_portal_session():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/stripe/webhook', methods=['POST'])
+@bp.route('/api/stripe/webhook', methods=['POST'])
 def stripe_webhook():
     payload = request.data
     sig_header = request.headers.get('Stripe-Signature')
+    stripe = get_stripe()
     
     try:
         event = stripe.Webhook.construct_event(
@@ -780,17 +2074,21 @@ def stripe_webhook():
     
     return jsonify({'success': True})
 
-    
-    db['messages'] = data
-    save_db(db)
-    
-    return jsonify({'success': True})
+def create_app():
+    """Create the Flask app and start loading the database in the background"""
+    # Files are served only through static_files, which refuses private data
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = 'scorecard-secret-key-2026-flask'
+    if TRUSTED_PROXY_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+    app.register_blueprint(bp)
+    threading.Thread(target=load_db_in_background, name='db-loader', daemon=True).start()
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
     print('\n🚀 Server running at http://localhost:{}'.format(port))
     print('📁 Serving files from:', os.getcwd())
-    print('\nDefault admin credentials:')
-    print('  Username: admin')
-    print('  Password: scorecard2026\n')
     app.run(host='0.0.0.0', port=port, debug=False)